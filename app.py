@@ -1,6 +1,8 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, render_template, jsonify, request, Response
 from datetime import datetime, date, timedelta
 import calendar
+import hashlib
+import json
 import logging
 import requests
 from config import *
@@ -18,8 +20,10 @@ if not logger.handlers:
 # Cache simple para clima (válido por 6 horas)
 CACHE_CLIMA = {
     'data': {},
+    'body': None,  # JSON serializado una vez por refresco para /api/clima
+    'etag': None,
     'timestamp': 0,
-    'duracion': CLIMA_CACHE_DURATION
+    'duracion': CLIMA_CACHE_TTL or CLIMA_CACHE_DURATION
 }
 CLIMA_CACHE_LOCK = Lock()
 
@@ -143,7 +147,7 @@ def obtener_clima_open_meteo():
             return CACHE_CLIMA['data']
 
     try:
-        url = CLIMA_CONFIG['url']
+        url = OPEN_METEO_URL or CLIMA_CONFIG['url']
         params = dict(CLIMA_CONFIG['params'])
 
         logger.info("[CLIMA API] Solicitando pronóstico a Open-Meteo...")
@@ -153,6 +157,7 @@ def obtener_clima_open_meteo():
 
         # Crear diccionario de fechas con códigos de clima y temperatura
         clima_por_fecha = {}
+        clima_serializable = {}
         if 'daily' in data:
             fechas = data['daily']['time']
             codigos = data['daily']['weathercode']
@@ -172,6 +177,7 @@ def obtener_clima_open_meteo():
                     'temp_min': int(temp_min[i]) if i < len(temp_min) and temp_min[i] else None
                 }
                 clima_por_fecha[fecha] = clima_info
+                clima_serializable[fecha_str] = clima_info
 
             logger.info(f"[CLIMA API] Procesadas {len(clima_por_fecha)} fechas correctamente")
 
@@ -183,9 +189,19 @@ def obtener_clima_open_meteo():
                     return CACHE_CLIMA['data']
             return {}
 
+        # Pre-serializar la respuesta del API una sola vez por refresco
+        body = json.dumps({
+            'success': True,
+            'timestamp': int(ahora),
+            'expira': int(ahora + CACHE_CLIMA['duracion']),
+            'clima': clima_serializable
+        }, separators=(',', ':'))
+
         # Actualizar cache
         with CLIMA_CACHE_LOCK:
             CACHE_CLIMA['data'] = clima_por_fecha
+            CACHE_CLIMA['body'] = body
+            CACHE_CLIMA['etag'] = f"clima-{int(ahora)}"
             CACHE_CLIMA['timestamp'] = ahora
 
         return clima_por_fecha
@@ -238,8 +254,10 @@ def set_security_headers(response):
     response.headers['Referrer-Policy'] = 'no-referrer'
     response.headers['Permissions-Policy'] = 'geolocation=(), microphone=(), camera=()'
 
+    # Respetar Cache-Control explícito de la vista (p. ej. /api/clima)
     if request.path.startswith('/api/') or request.path == '/health':
-        response.headers['Cache-Control'] = 'no-store'
+        if 'Cache-Control' not in response.headers:
+            response.headers['Cache-Control'] = 'no-store'
 
     return response
 
@@ -320,19 +338,48 @@ def obtener_feriados(anio):
     
     return feriados
 
+def calcular_periodo(fecha):
+    """Calcula el número de período de guardia de una fecha, relativo a la referencia"""
+    return (fecha - FECHA_REFERENCIA_DATE).days // DURACION_GUARDIA
+
+def indice_guardia_periodo(periodo):
+    """Retorna el índice en GUARDIAS de quien cubre un período"""
+    return (INDICE_REFERENCIA + periodo) % len(GUARDIAS)
+
 def calcular_guardia(fecha):
     """Calcula qué guardia corresponde a una fecha dada"""
-    ref = FECHA_REFERENCIA_DATE
+    return GUARDIAS[indice_guardia_periodo(calcular_periodo(fecha))]
 
-    if fecha >= ref:
-        dias = (fecha - ref).days
-    else:
-        dias = -(ref - fecha).days
+def generar_indice_guardias(anio, hoy):
+    """
+    Genera el índice compacto de segmentos de guardia que se embebe en la página.
 
-    periodos = dias // DURACION_GUARDIA
-    idx_guardia = (INDICE_REFERENCIA + periodos) % len(GUARDIAS)
+    Cubre el año mostrado y, además, desde hoy hasta un ciclo completo de
+    rotación, para que "próxima guardia" sea correcta aunque cruce el año.
+    Las fechas van como días desde 1970-01-01 para que JavaScript las compare
+    sin depender de la zona horaria. Cada segmento es [inicio, fin, índice].
+    """
+    epoch = date(1970, 1, 1)
+    primer_dia = date(anio, 1, 1)
+    ultimo_dia = date(anio, 12, 31)
+    ciclo = DURACION_GUARDIA * len(GUARDIAS)
+
+    periodos = set()
+    for desde, hasta in ((primer_dia, ultimo_dia), (hoy, hoy + timedelta(days=ciclo + DURACION_GUARDIA))):
+        periodos.update(range(calcular_periodo(desde), calcular_periodo(hasta) + 1))
+
+    segmentos = []
+    for periodo in sorted(periodos):
+        inicio = FECHA_REFERENCIA_DATE + timedelta(days=periodo * DURACION_GUARDIA)
+        fin = inicio + timedelta(days=DURACION_GUARDIA - 1)
+        segmentos.append([(inicio - epoch).days, (fin - epoch).days, indice_guardia_periodo(periodo)])
 
-    return GUARDIAS[idx_guardia]
+    return {
+        'guardias': GUARDIAS,
+        'anio_inicio': (primer_dia - epoch).days,
+        'anio_fin': (ultimo_dia - epoch).days,
+        'segmentos': segmentos
+    }
 
 def obtener_guardia_actual():
     """Retorna información de la guardia actual"""
@@ -460,6 +507,7 @@ def generar_calendario_completo(anio):
         'meses_data': meses_data,
         'guardia_actual': guardia_actual,
         'feriados_por_guardia': feriados_por_guardia,
+        'indice_guardias': generar_indice_guardias(anio, hoy),
         'hoy': hoy
     }
 
@@ -472,44 +520,10 @@ def health_check():
         'timestamp': datetime.now().isoformat()
     })
 
-@app.route('/')
-def index():
-    """Ruta principal - muestra año actual completo CON CACHÉ"""
-    anio_actual = datetime.now().year
-
-    # Intentar obtener del caché
-    calendario_data = calendario_cache.get(anio_actual)
-
-    # Si no está en caché, generar y cachear
-    if calendario_data is None:
-        logger.info(f"[GENERANDO] Calendario para año {anio_actual} (Petición de cliente)...")
-        inicio = time.time()
-        calendario_data = generar_calendario_completo(anio_actual)
-        calendario_cache.set(anio_actual, calendario_data)
-        duracion = time.time() - inicio
-        logger.info(f"[CACHE SET] Calendario para año {anio_actual} guardado en caché")
-        logger.info(f"[GENERADO] Calendario para año {anio_actual} en {duracion:.3f}s")
-    else:
-        logger.debug(f"[CACHE HIT] Sirviendo año {anio_actual} desde caché (Petición de cliente)")
-
-    return render_template('index.html',
-                         meses_data=calendario_data['meses_data'],
-                         guardias=GUARDIAS,
-                         colores=COLORES,
-                         celular=CELULAR_CORPORATIVO,
-                         anio=anio_actual,
-                         guardia_actual=calendario_data['guardia_actual'],
-                         feriados_por_guardia=calendario_data['feriados_por_guardia'],
-                         hoy=calendario_data['hoy'])
-
-@app.route('/anio/<int:anio>')
-def ver_anio(anio):
-    """Muestra el calendario de un año específico CON CACHÉ"""
-
-    # Intentar obtener del caché
+def obtener_calendario_cache(anio):
+    """Obtiene el calendario de un año desde el caché, generándolo si hace falta"""
     calendario_data = calendario_cache.get(anio)
 
-    # Si no está en caché, generar y cachear
     if calendario_data is None:
         logger.info(f"[GENERANDO] Calendario para año {anio}...")
         inicio = time.time()
@@ -520,6 +534,116 @@ def ver_anio(anio):
     else:
         logger.debug(f"[CACHE HIT] Sirviendo año {anio} desde caché")
 
+    return calendario_data
+
+def generar_json_anio(anio, calendario_data):
+    """Representación JSON del calendario de un año (equivalente a /anio/<anio>)"""
+    dias = []
+    for mes_data in calendario_data['meses_data']:
+        for dia in mes_data['fila']:
+            if dia is None:
+                continue
+            dias.append({
+                'fecha': date(anio, mes_data['mes_numero'], dia['dia']).isoformat(),
+                'guardia': dia['guardia'],
+                'feriado': dia['nombre_feriado'],
+                'tipo_feriado': dia['tipo_feriado']
+            })
+
+    return {
+        'anio': anio,
+        'duracion_guardia': DURACION_GUARDIA,
+        'guardias': [
+            {
+                'nombre': guardia,
+                'color': COLORES[guardia],
+                'feriados': calendario_data['feriados_por_guardia'][guardia]
+            }
+            for guardia in GUARDIAS
+        ],
+        'dias': dias
+    }
+
+def escapar_ics(texto):
+    """Escapa texto para propiedades iCalendar (RFC 5545)"""
+    return texto.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+def plegar_linea_ics(linea):
+    """Pliega líneas de más de 75 octetos (RFC 5545, sección 3.1)"""
+    partes = []
+    actual = ''
+    for caracter in linea:
+        limite = 75 if not partes else 74  # la continuación empieza con un espacio
+        if len((actual + caracter).encode('utf-8')) > limite:
+            partes.append(actual)
+            actual = ''
+        actual += caracter
+    partes.append(actual)
+    return '\r\n '.join(partes)
+
+def uid_ics(tipo, fecha, *contenido):
+    """
+    UID de un evento iCalendar. Incluye un hash del contenido para que, si cambia
+    la rotación o un feriado, el evento sea otro y los clientes suscritos lo
+    reemplacen en lugar de conservar la asignación anterior.
+    """
+    huella = hashlib.sha256('\x1f'.join(contenido).encode('utf-8')).hexdigest()[:12]
+    return f'{tipo}-{fecha:%Y%m%d}-{huella}@sistema-guardias'
+
+def generar_ics_anio(anio):
+    """
+    Genera un iCalendar con un evento de día completo por guardia y por feriado del año.
+    La salida es determinística para poder compararla entre exportaciones: todos
+    los eventos usan un único DTSTAMP fijo derivado de FECHA_REFERENCIA_DATE y
+    los cambios de contenido se reflejan en el UID (ver uid_ics).
+    """
+    dtstamp = f'{FECHA_REFERENCIA_DATE:%Y%m%d}T000000Z'
+    lineas = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//sistema-guardias//Cronograma de Guardias//ES',
+        'CALSCALE:GREGORIAN',
+        f'X-WR-CALNAME:Guardias {anio}',
+    ]
+
+    for periodo in range(calcular_periodo(date(anio, 1, 1)), calcular_periodo(date(anio, 12, 31)) + 1):
+        inicio = FECHA_REFERENCIA_DATE + timedelta(days=periodo * DURACION_GUARDIA)
+        fin = inicio + timedelta(days=DURACION_GUARDIA)  # DTEND exclusivo
+        guardia = GUARDIAS[indice_guardia_periodo(periodo)]
+        lineas += [
+            'BEGIN:VEVENT',
+            f'UID:{uid_ics("guardia", inicio, fin.isoformat(), guardia)}',
+            f'DTSTAMP:{dtstamp}',
+            f'DTSTART;VALUE=DATE:{inicio:%Y%m%d}',
+            f'DTEND;VALUE=DATE:{fin:%Y%m%d}',
+            f'SUMMARY:{escapar_ics("Guardia: " + guardia)}',
+            'TRANSP:TRANSPARENT',
+            'END:VEVENT',
+        ]
+
+    feriados = obtener_feriados_cache(anio)
+    for fecha in sorted(feriados):
+        feriado = feriados[fecha]
+        guardia = calcular_guardia(fecha)
+        lineas += [
+            'BEGIN:VEVENT',
+            f'UID:{uid_ics("feriado", fecha, feriado["nombre"], feriado["tipo"], guardia)}',
+            f'DTSTAMP:{dtstamp}',
+            f'DTSTART;VALUE=DATE:{fecha:%Y%m%d}',
+            f'DTEND;VALUE=DATE:{fecha + timedelta(days=1):%Y%m%d}',
+            f'SUMMARY:{escapar_ics(feriado["nombre"])}',
+            f'DESCRIPTION:{escapar_ics("Feriado " + feriado["tipo"] + " - Guardia: " + guardia)}',
+            'TRANSP:TRANSPARENT',
+            'END:VEVENT',
+        ]
+
+    lineas.append('END:VCALENDAR')
+    return '\r\n'.join(plegar_linea_ics(linea) for linea in lineas) + '\r\n'
+
+def renderizar_anio(anio):
+    """Renderiza index.html para un año (usado por las rutas y por export_static.py)"""
+    calendario_data = obtener_calendario_cache(anio)
+
     return render_template('index.html',
                          meses_data=calendario_data['meses_data'],
                          guardias=GUARDIAS,
@@ -528,8 +652,30 @@ def ver_anio(anio):
                          anio=anio,
                          guardia_actual=calendario_data['guardia_actual'],
                          feriados_por_guardia=calendario_data['feriados_por_guardia'],
+                         indice_guardias=calendario_data['indice_guardias'],
                          hoy=calendario_data['hoy'])
 
+@app.route('/')
+def index():
+    """Ruta principal - muestra año actual completo CON CACHÉ"""
+    return renderizar_anio(datetime.now().year)
+
+@app.route('/anio/<int:anio>')
+def ver_anio(anio):
+    """Muestra el calendario de un año específico CON CACHÉ"""
+    return renderizar_anio(anio)
+
+@app.route('/anio/<int:anio>.json')
+def ver_anio_json(anio):
+    """Calendario de un año en JSON"""
+    return jsonify(generar_json_anio(anio, obtener_calendario_cache(anio)))
+
+@app.route('/anio/<int:anio>.ics')
+def ver_anio_ics(anio):
+    """Calendario de un año en formato iCalendar"""
+    return Response(generar_ics_anio(anio), mimetype='text/calendar',
+                    headers={'Content-Disposition': f'inline; filename=guardias-{anio}.ics'})
+
 @app.route('/guardias/api/clima')
 @app.route('/api/clima')
 def obtener_clima():
@@ -538,26 +684,31 @@ def obtener_clima():
         logger.info("[API CLIMA] Cliente solicitando pronóstico del clima")
         clima_por_fecha = obtener_clima_open_meteo()
 
-        logger.debug(f"[API CLIMA] obtener_clima_open_meteo() retornó {len(clima_por_fecha)} registros")
-        logger.debug(f"[API CLIMA] Tipo de datos: {type(clima_por_fecha)}")
-
-        if clima_por_fecha:
-            primera_clave = list(clima_por_fecha.keys())[0]
-            logger.debug(f"[API CLIMA] Primera clave: {primera_clave} (tipo: {type(primera_clave)})")
-
-        # Convertir fechas a strings para JSON
-        clima_serializable = {}
-        for fecha, clima_info in clima_por_fecha.items():
-            fecha_str = fecha.strftime('%Y-%m-%d')
-            clima_serializable[fecha_str] = clima_info
-            logger.debug(f"[API CLIMA] Convertido: {fecha_str} -> {clima_info}")
+        with CLIMA_CACHE_LOCK:
+            body = CACHE_CLIMA['body']
+            etag = CACHE_CLIMA['etag']
+            expira = CACHE_CLIMA['timestamp'] + CACHE_CLIMA['duracion']
+
+        if not clima_por_fecha or body is None:
+            logger.warning("[API CLIMA] Sin pronóstico disponible para enviar")
+            return jsonify({
+                'success': True,
+                'clima': {}
+            })
 
-        logger.info(f"[API CLIMA] Enviando {len(clima_serializable)} registros al cliente")
+        # Respuesta pre-serializada, cacheable hasta que expire el caché del servidor
+        response = app.response_class(body, mimetype='application/json')
+        response.set_etag(etag)
+        max_age = int(expira - time.time())
+        if max_age > 0:
+            response.cache_control.public = True
+            response.cache_control.max_age = max_age
+        else:
+            # Caché vencido usado como fallback: el cliente debe revalidar
+            response.cache_control.no_cache = True
 
-        return jsonify({
-            'success': True,
-            'clima': clima_serializable
-        })
+        logger.info(f"[API CLIMA] Enviando {len(clima_por_fecha)} registros al cliente (max-age={max(max_age, 0)})")
+        return response.make_conditional(request)
     except Exception as e:
         logger.exception("[API CLIMA ERROR] Error procesando pronóstico")
         return jsonify({
@@ -64,3 +64,11 @@ for i, guardia in enumerate(GUARDIAS):
 CLIMA_API_URL = "http://api.weatherapi.com/v1/history.json"
 CLIMA_API_KEY = ''  # Dejar vacío para deshabilitar API de clima
 CLIMA_CACHE_DURATION = 6 * 60 * 60  # 6 horas
+
+# Overrides opcionales para pruebas de carga (ver loadtest/)
+OPEN_METEO_URL = os.getenv('OPEN_METEO_URL', '')  # Vacío = usar CLIMA_CONFIG['url']
+try:
+    CLIMA_CACHE_TTL = int(os.getenv('CLIMA_CACHE_TTL', '0') or 0)  # 0 = usar CLIMA_CACHE_DURATION
+except ValueError:
+    logger.warning('CLIMA_CACHE_TTL invalido: %s. Usando duracion por defecto', os.getenv('CLIMA_CACHE_TTL'))
+    CLIMA_CACHE_TTL = 0
@@ -0,0 +1,176 @@
+"""
+Exportación estática de calendarios para que Nginx los sirva directamente.
+
+Pre-renderiza index.html, JSON e ICS de un rango de años (más variantes .gz
+para gzip_static) en un directorio. Solo regenera los archivos cuyas
+entradas cambiaron: configuración, código/plantilla y, solo para el HTML, el
+período de guardia actual y el día (año en curso). Los años exportados antes que quedan fuera del rango se eliminan,
+para que Nginx los derive a Flask en lugar de servir copias congeladas.
+Ejecutarlo a diario tras la medianoche, p. ej. desde cron.
+
+Uso:
+    python export_static.py --desde 2025 --hasta 2028 --salida /srv/guardias-static
+    python export_static.py --forzar
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import sys
+from datetime import date
+
+from app import (
+    app, calcular_periodo, CELULAR_CORPORATIVO, COLORES, DURACION_GUARDIA,
+    FECHA_REFERENCIA_DATE, GUARDIAS, INDICE_REFERENCIA
+)
+
+logger = logging.getLogger("sistema_guardias")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Archivos cuyo contenido afecta al HTML/JSON/ICS generado
+ARCHIVOS_ENTRADA = ['app.py', 'config.py', 'constants.py', 'templates/index.html']
+
+MANIFIESTO = '.export-manifest.json'
+
+
+def hash_archivo(ruta):
+    with open(os.path.join(BASE_DIR, ruta), 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def huella_archivo(anio, hoy, prefijo, hashes_codigo, depende_del_dia):
+    """
+    Huella de las entradas que determinan un archivo exportado.
+
+    Solo el HTML depende de hoy: el índice de guardias embebido usa el período
+    actual (ventana de "próxima guardia") y el año en curso marca el día exacto.
+    JSON e ICS no, así no cambian (ni su ETag en Nginx) cada día.
+    """
+    entradas = {
+        'anio': anio,
+        'guardias': GUARDIAS,
+        'colores': COLORES,
+        'fecha_referencia': FECHA_REFERENCIA_DATE.isoformat(),
+        'indice_referencia': INDICE_REFERENCIA,
+        'duracion_guardia': DURACION_GUARDIA,
+        'celular': CELULAR_CORPORATIVO,
+        'prefijo': prefijo,
+        'codigo': hashes_codigo,
+        'periodo_hoy': calcular_periodo(hoy) if depende_del_dia else None,
+        'hoy': hoy.isoformat() if depende_del_dia and anio == hoy.year else None,
+    }
+    return hashlib.sha256(json.dumps(entradas, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def escribir_archivo(ruta, contenido):
+    """Escribe de forma atómica el archivo y su variante .gz"""
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    for destino, datos in ((ruta, contenido), (ruta + '.gz', gzip.compress(contenido, compresslevel=9, mtime=0))):
+        temporal = destino + '.tmp'
+        with open(temporal, 'wb') as f:
+            f.write(datos)
+        os.replace(temporal, destino)
+
+
+def obtener(cliente, path, prefijo):
+    """Renderiza una ruta a través de la app, igual que detrás de Nginx"""
+    headers = {'X-Forwarded-Prefix': prefijo} if prefijo else {}
+    respuesta = cliente.get(path, headers=headers)
+    if respuesta.status_code != 200:
+        raise RuntimeError(f"{path} respondió {respuesta.status_code}")
+    return respuesta.get_data()
+
+
+def leer_manifiesto(salida):
+    try:
+        with open(os.path.join(salida, MANIFIESTO)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def eliminar_archivo(ruta):
+    """Elimina el archivo y su variante .gz si existen"""
+    for destino in (ruta, ruta + '.gz'):
+        if os.path.exists(destino):
+            os.remove(destino)
+
+
+def exportar(salida, desde, hasta, prefijo, forzar=False):
+    """
+    Exporta los años [desde, hasta] y la página raíz y elimina los años
+    exportados previamente que quedaron fuera del rango.
+    Retorna (generados, omitidos, eliminados).
+    """
+    hoy = date.today()
+    hashes_codigo = {ruta: hash_archivo(ruta) for ruta in ARCHIVOS_ENTRADA}
+    manifiesto = {} if forzar else leer_manifiesto(salida)
+    nuevo_manifiesto = {}
+
+    # (archivo de salida, año, ruta de la app, depende del día)
+    archivos = [('index.html', hoy.year, '/', True)]
+    for anio in range(desde, hasta + 1):
+        archivos += [
+            (f'anio/{anio}.html', anio, f'/anio/{anio}', True),
+            (f'anio/{anio}.json', anio, f'/anio/{anio}.json', False),
+            (f'anio/{anio}.ics', anio, f'/anio/{anio}.ics', False),
+        ]
+
+    generados = 0
+    omitidos = 0
+    with app.test_client() as cliente:
+        for archivo, anio, path, depende_del_dia in archivos:
+            huella = huella_archivo(anio, hoy, prefijo, hashes_codigo, depende_del_dia)
+            nuevo_manifiesto[archivo] = huella
+
+            # Incluye la variante .gz: gzip_static de Nginx depende de ella
+            ruta = os.path.join(salida, archivo)
+            existentes = os.path.exists(ruta) and os.path.exists(ruta + '.gz')
+            if manifiesto.get(archivo) == huella and existentes:
+                omitidos += 1
+                logger.debug(f"[EXPORT] {archivo} sin cambios")
+                continue
+
+            escribir_archivo(ruta, obtener(cliente, path, prefijo))
+            generados += 1
+            logger.info(f"[EXPORT] {archivo} regenerado")
+
+    # Años fuera del rango: borrar sus archivos para que Nginx los derive a Flask
+    eliminados = 0
+    for archivo in sorted(set(leer_manifiesto(salida)) - set(nuevo_manifiesto)):
+        eliminar_archivo(os.path.join(salida, archivo))
+        eliminados += 1
+        logger.info(f"[EXPORT] {archivo} eliminado (fuera del rango exportado)")
+
+    os.makedirs(salida, exist_ok=True)
+    with open(os.path.join(salida, MANIFIESTO), 'w') as f:
+        json.dump(nuevo_manifiesto, f, indent=2, sort_keys=True)
+
+    return generados, omitidos, eliminados
+
+
+def main():
+    anio_actual = date.today().year
+    parser = argparse.ArgumentParser(description="Exporta los calendarios pre-renderizados para Nginx")
+    parser.add_argument('--salida', default=os.path.join(BASE_DIR, 'dist'), help="Directorio de salida")
+    parser.add_argument('--desde', type=int, default=anio_actual - 1, help="Primer año a exportar")
+    parser.add_argument('--hasta', type=int, default=anio_actual + 2, help="Último año a exportar")
+    parser.add_argument('--prefijo', default='/guardias',
+                        help="Prefijo público bajo el que Nginx expone la app ('' si es la raíz)")
+    parser.add_argument('--forzar', action='store_true', help="Regenerar todo ignorando el manifiesto")
+    args = parser.parse_args()
+
+    if args.desde > args.hasta:
+        parser.error("--desde no puede ser mayor que --hasta")
+
+    generados, omitidos, eliminados = exportar(args.salida, args.desde, args.hasta, args.prefijo, args.forzar)
+    logger.info(f"[EXPORT] {generados} archivos regenerados, {omitidos} sin cambios, "
+                f"{eliminados} eliminados en {args.salida}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
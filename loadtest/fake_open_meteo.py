@@ -0,0 +1,209 @@
+"""
+Servidor local que imita el endpoint /v1/forecast de Open-Meteo.
+
+Permite inyectar fallas para reproducir los incidentes de latencia:
+- latencia fija + jitter por respuesta
+- tasa de errores 5xx
+- tasa de respuestas sin bloque 'daily'
+- tasa de timeouts (la respuesta se demora más que CLIMA_API_TIMEOUT)
+
+El modo se cambia en caliente con POST /_control (JSON con los mismos campos
+que FallasConfig), así el harness no necesita reiniciar el servidor entre
+escenarios.
+
+Uso independiente:
+    python loadtest/fake_open_meteo.py --port 8081 --latency-ms 200 --error-rate 0.1
+"""
+import argparse
+import json
+import logging
+import random
+import time
+from dataclasses import dataclass, asdict, fields
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+
+logger = logging.getLogger("fake_open_meteo")
+
+
+@dataclass
+class FallasConfig:
+    """Parámetros de inyección de fallas del servidor falso"""
+    latency_ms: int = 0
+    jitter_ms: int = 0
+    error_rate: float = 0.0
+    empty_rate: float = 0.0
+    timeout_rate: float = 0.0
+    timeout_s: float = 30.0
+    forecast_days: int = 7
+
+
+class EstadoServidor:
+    """Configuración activa y contadores, compartidos entre hilos"""
+    def __init__(self, config):
+        self.lock = Lock()
+        self.config = config
+        self.contadores = {'total': 0, 'ok': 0, 'error': 0, 'vacio': 0, 'timeout': 0}
+
+    def actualizar(self, cambios):
+        validos = {f.name for f in fields(FallasConfig)}
+        with self.lock:
+            datos = asdict(self.config)
+            datos.update({k: v for k, v in cambios.items() if k in validos})
+            self.config = FallasConfig(**datos)
+            self.contadores = dict.fromkeys(self.contadores, 0)
+            return asdict(self.config)
+
+    def registrar(self, resultado):
+        with self.lock:
+            self.contadores['total'] += 1
+            self.contadores[resultado] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {'config': asdict(self.config), 'contadores': dict(self.contadores)}
+
+
+def generar_pronostico(dias):
+    """Payload con la misma forma que la respuesta real de Open-Meteo"""
+    hoy = date.today()
+    fechas = [(hoy + timedelta(days=i)).isoformat() for i in range(dias)]
+    codigos = [0, 1, 2, 3, 61, 71, 95]
+    return {
+        'latitude': -42.75,
+        'longitude': -65.0,
+        'timezone': 'America/Argentina/Buenos_Aires',
+        'daily': {
+            'time': fechas,
+            'weathercode': [codigos[i % len(codigos)] for i in range(dias)],
+            'temperature_2m_max': [18.4 + i for i in range(dias)],
+            'temperature_2m_min': [6.2 + i for i in range(dias)],
+        }
+    }
+
+
+class FakeOpenMeteoHandler(BaseHTTPRequestHandler):
+    server_version = "FakeOpenMeteo/1.0"
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _enviar_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        estado = self.server.estado
+
+        if self.path.startswith('/_control'):
+            self._enviar_json(200, estado.snapshot())
+            return
+
+        if not self.path.startswith('/v1/forecast'):
+            self._enviar_json(404, {'error': True, 'reason': 'Not found'})
+            return
+
+        config = estado.snapshot()['config']
+        sorteo = random.random()
+
+        if sorteo < config['timeout_rate']:
+            estado.registrar('timeout')
+            time.sleep(config['timeout_s'])
+            try:
+                self._enviar_json(504, {'error': True, 'reason': 'Timeout simulado'})
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            return
+
+        demora = config['latency_ms'] + random.uniform(0, config['jitter_ms'])
+        if demora > 0:
+            time.sleep(demora / 1000)
+
+        sorteo -= config['timeout_rate']
+        if sorteo < config['error_rate']:
+            estado.registrar('error')
+            self._enviar_json(random.choice([500, 502, 503]), {'error': True, 'reason': 'Error simulado'})
+            return
+
+        sorteo -= config['error_rate']
+        if sorteo < config['empty_rate']:
+            estado.registrar('vacio')
+            payload = generar_pronostico(config['forecast_days'])
+            del payload['daily']
+            self._enviar_json(200, payload)
+            return
+
+        estado.registrar('ok')
+        self._enviar_json(200, generar_pronostico(config['forecast_days']))
+
+    def do_POST(self):
+        if not self.path.startswith('/_control'):
+            self._enviar_json(404, {'error': True, 'reason': 'Not found'})
+            return
+
+        largo = int(self.headers.get('Content-Length') or 0)
+        try:
+            cambios = json.loads(self.rfile.read(largo) or b'{}')
+        except ValueError:
+            self._enviar_json(400, {'error': True, 'reason': 'JSON invalido'})
+            return
+
+        config = self.server.estado.actualizar(cambios)
+        logger.info("[FAKE OPEN-METEO] Configuración actualizada: %s", config)
+        self._enviar_json(200, {'config': config})
+
+
+def crear_servidor(host='127.0.0.1', port=0, config=None):
+    """Crea el servidor (port=0 elige un puerto libre) sin iniciarlo"""
+    servidor = ThreadingHTTPServer((host, port), FakeOpenMeteoHandler)
+    servidor.daemon_threads = True
+    servidor.estado = EstadoServidor(config or FallasConfig())
+    return servidor
+
+
+def iniciar_en_hilo(host='127.0.0.1', port=0, config=None):
+    """Inicia el servidor en un hilo daemon y lo retorna"""
+    servidor = crear_servidor(host, port, config)
+    hilo = Thread(target=servidor.serve_forever, name="fake-open-meteo", daemon=True)
+    hilo.start()
+    return servidor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor falso de Open-Meteo con inyección de fallas")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency-ms', type=int, default=0)
+    parser.add_argument('--jitter-ms', type=int, default=0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--empty-rate', type=float, default=0.0)
+    parser.add_argument('--timeout-rate', type=float, default=0.0)
+    parser.add_argument('--timeout-s', type=float, default=30.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    config = FallasConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        empty_rate=args.empty_rate,
+        timeout_rate=args.timeout_rate,
+        timeout_s=args.timeout_s,
+    )
+    servidor = crear_servidor(args.host, args.port, config)
+    logger.info("[FAKE OPEN-METEO] Escuchando en http://%s:%s/v1/forecast", args.host, servidor.server_port)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == '__main__':
+    main()
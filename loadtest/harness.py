@@ -0,0 +1,304 @@
+"""
+Harness de pruebas de carga para el sistema de guardias.
+
+Levanta la app bajo gunicorn apuntando a un Open-Meteo falso local
+(fake_open_meteo.py), y para cada escenario de fallas genera tráfico mixto
+contra /, /anio/<anio>, /api/clima y /health con distintos niveles de
+concurrencia. Reporta p50/p95/p99 y tasa de errores por endpoint.
+
+Cada escenario corre durante un tiempo fijo (--duration). Antes de empezar se
+espera --clima-ttl segundos para que venza el caché de clima cargado en el
+escenario anterior; así cada escenario llega al upstream falso y ejercita el
+fallback a CACHE_CLIMA. Si un escenario termina sin ninguna llamada al
+upstream se reporta como advertencia y el harness sale con código 1.
+
+Uso:
+    python loadtest/harness.py
+    python loadtest/harness.py --concurrency 1,16,64 --duration 30 --scenarios normal,timeout
+    python loadtest/harness.py --workers 2 --threads 4 --json resultados.json
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from datetime import date
+from threading import Lock
+
+from fake_open_meteo import FallasConfig, iniciar_en_hilo
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Escenarios de fallas del Open-Meteo falso (campos de FallasConfig)
+ESCENARIOS = {
+    'normal': {'latency_ms': 50, 'jitter_ms': 50},
+    'lento': {'latency_ms': 3000, 'jitter_ms': 1500},
+    'errores_5xx': {'latency_ms': 50, 'error_rate': 0.5},
+    'daily_vacio': {'latency_ms': 50, 'empty_rate': 1.0},
+    'timeout': {'timeout_rate': 1.0, 'timeout_s': 10.0},
+}
+
+# Mezcla de tráfico (endpoint -> peso)
+MEZCLA_TRAFICO = {
+    '/': 40,
+    '/anio/<anio>': 30,
+    '/api/clima': 20,
+    '/health': 10,
+}
+
+
+def puerto_libre():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def iniciar_gunicorn(port, fake_url, args, log):
+    """Inicia gunicorn con la app apuntando al Open-Meteo falso; log recibe su salida"""
+    env = dict(os.environ)
+    env['OPEN_METEO_URL'] = fake_url
+    env['CLIMA_CACHE_TTL'] = str(args.clima_ttl)
+
+    cmd = [
+        sys.executable, '-m', 'gunicorn',
+        '--workers', str(args.workers),
+        '--threads', str(args.threads),
+        '--bind', f'127.0.0.1:{port}',
+        'wsgi:app',
+    ]
+    return subprocess.Popen(cmd, cwd=REPO_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def esperar_health(base_url, proceso, espera_max=20):
+    limite = time.time() + espera_max
+    while time.time() < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError(f"gunicorn terminó con código {proceso.returncode}")
+        try:
+            with urllib.request.urlopen(base_url + '/health', timeout=2) as resp:
+                if resp.status == 200:
+                    return
+        except (urllib.error.URLError, OSError):
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("gunicorn no respondió /health a tiempo")
+
+
+def configurar_fallas(servidor_fake, cambios):
+    """Reinicia la configuración del servidor falso y aplica el escenario"""
+    config = asdict(FallasConfig())
+    config.update(cambios)
+    return servidor_fake.estado.actualizar(config)
+
+
+def elegir_ruta(rng):
+    """Retorna (etiqueta, path) según MEZCLA_TRAFICO"""
+    etiqueta = rng.choices(list(MEZCLA_TRAFICO), weights=list(MEZCLA_TRAFICO.values()))[0]
+    if etiqueta == '/anio/<anio>':
+        return etiqueta, f'/anio/{date.today().year + rng.randint(-2, 2)}'
+    return etiqueta, etiqueta
+
+
+def ejecutar_peticion(base_url, etiqueta, path, timeout):
+    """Retorna (etiqueta, latencia_ms, ok, clima_vacio)"""
+    inicio = time.perf_counter()
+    ok = False
+    clima_vacio = False
+    try:
+        with urllib.request.urlopen(base_url + path, timeout=timeout) as resp:
+            body = resp.read()
+            ok = resp.status < 400
+            if ok and etiqueta == '/api/clima':
+                clima_vacio = not json.loads(body).get('clima')
+    except (urllib.error.URLError, http.client.HTTPException, OSError, ValueError):
+        # HTTPException cubre respuestas cortadas bajo carga (IncompleteRead, etc.)
+        ok = False
+    latencia = (time.perf_counter() - inicio) * 1000
+    return etiqueta, latencia, ok, clima_vacio
+
+
+def percentil(valores_ordenados, p):
+    if not valores_ordenados:
+        return 0.0
+    idx = max(0, min(len(valores_ordenados) - 1, int(round(p / 100 * len(valores_ordenados))) - 1))
+    return valores_ordenados[idx]
+
+
+def resumir(resultados):
+    """Agrupa resultados por endpoint y calcula percentiles y tasas"""
+    grupos = {}
+    for etiqueta, latencia, ok, clima_vacio in resultados:
+        grupos.setdefault(etiqueta, []).append((latencia, ok, clima_vacio))
+        grupos.setdefault('TOTAL', []).append((latencia, ok, clima_vacio))
+
+    resumen = {}
+    for etiqueta, filas in grupos.items():
+        latencias = sorted(f[0] for f in filas)
+        errores = sum(1 for f in filas if not f[1])
+        vacios = sum(1 for f in filas if f[2])
+        resumen[etiqueta] = {
+            'n': len(filas),
+            'p50_ms': round(percentil(latencias, 50), 1),
+            'p95_ms': round(percentil(latencias, 95), 1),
+            'p99_ms': round(percentil(latencias, 99), 1),
+            'max_ms': round(latencias[-1], 1),
+            'error_rate': round(errores / len(filas), 4),
+            'clima_vacio_rate': round(vacios / len(filas), 4),
+        }
+    return resumen
+
+
+def imprimir_resumen(escenario, concurrencia, duracion, resumen, upstream):
+    total = resumen.get('TOTAL', {}).get('n', 0)
+    rps = total / duracion if duracion > 0 else 0
+    print(f"\n== Escenario: {escenario} | concurrencia: {concurrencia} | "
+          f"{total} req en {duracion:.1f}s ({rps:.1f} req/s) | upstream: {upstream}")
+    print(f"{'endpoint':<16}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'error%':>9}{'vacío%':>9}")
+    orden = [e for e in MEZCLA_TRAFICO if e in resumen] + ['TOTAL']
+    for etiqueta in orden:
+        r = resumen[etiqueta]
+        print(f"{etiqueta:<16}{r['n']:>6}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{r['max_ms']:>10}"
+              f"{r['error_rate'] * 100:>8.1f}%{r['clima_vacio_rate'] * 100:>8.1f}%")
+
+
+def correr_escenario(base_url, servidor_fake, escenario, concurrencia, args, rng):
+    configurar_fallas(servidor_fake, ESCENARIOS[escenario])
+
+    # Esperar a que venza el caché de clima de la app (cargado con el
+    # escenario anterior) para que este escenario llegue al upstream falso
+    time.sleep(args.clima_ttl + 0.5)
+    servidor_fake.estado.actualizar({})  # reinicia contadores del upstream
+
+    resultados = []
+    lock = Lock()
+    emitidas = [0]
+    limite = time.time() + args.duration
+
+    def trabajador(semilla):
+        rng_local = random.Random(semilla)
+        while time.time() < limite:
+            with lock:
+                if args.requests and emitidas[0] >= args.requests:
+                    return
+                emitidas[0] += 1
+            etiqueta, path = elegir_ruta(rng_local)
+            resultado = ejecutar_peticion(base_url, etiqueta, path, args.client_timeout)
+            with lock:
+                resultados.append(resultado)
+
+    inicio = time.time()
+    with ThreadPoolExecutor(max_workers=concurrencia) as executor:
+        futuros = [executor.submit(trabajador, rng.random()) for _ in range(concurrencia)]
+    # Propagar fallas de los trabajadores: un hilo caído bajaría la concurrencia real
+    for futuro in futuros:
+        futuro.result()
+    duracion = time.time() - inicio
+
+    resumen = resumir(resultados)
+    upstream = servidor_fake.estado.snapshot()['contadores']
+    imprimir_resumen(escenario, concurrencia, duracion, resumen, upstream)
+
+    advertencia = None
+    if resumen.get('/api/clima', {}).get('n', 0) > 0 and upstream['total'] == 0:
+        advertencia = (f"{escenario} (concurrencia {concurrencia}): ninguna llamada al upstream, "
+                       f"las métricas de /api/clima reflejan solo el caché")
+        print(f"ADVERTENCIA: {advertencia}", file=sys.stderr)
+
+    return {
+        'escenario': escenario,
+        'concurrencia': concurrencia,
+        'duracion_s': round(duracion, 3),
+        'upstream': upstream,
+        'endpoints': resumen,
+        'advertencia': advertencia,
+    }
+
+
+def parse_lista(valor):
+    return [v.strip() for v in valor.split(',') if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pruebas de carga con Open-Meteo falso e inyección de fallas")
+    parser.add_argument('--scenarios', default=','.join(ESCENARIOS),
+                        help=f"Escenarios separados por coma ({', '.join(ESCENARIOS)})")
+    parser.add_argument('--concurrency', default='1,8,32', help="Niveles de concurrencia separados por coma")
+    parser.add_argument('--duration', type=float, default=15.0,
+                        help="Segundos de tráfico por escenario y nivel (las peticiones en curso pueden "
+                             "demorar hasta --client-timeout más)")
+    parser.add_argument('--requests', type=int, default=0,
+                        help="Tope opcional de peticiones por escenario y nivel (0 = sin tope)")
+    parser.add_argument('--workers', type=int, default=1, help="Workers de gunicorn (Dockerfile usa 1)")
+    parser.add_argument('--threads', type=int, default=1, help="Threads por worker de gunicorn (Dockerfile usa 1)")
+    parser.add_argument('--clima-ttl', type=int, default=5, help="TTL del caché de clima en segundos")
+    parser.add_argument('--client-timeout', type=float, default=15.0)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--app-log', default=None, help="Archivo para la salida de gunicorn")
+    parser.add_argument('--json', dest='json_path', default=None, help="Guardar resultados en JSON")
+    args = parser.parse_args()
+
+    escenarios = parse_lista(args.scenarios)
+    invalidos = [e for e in escenarios if e not in ESCENARIOS]
+    if invalidos:
+        parser.error(f"Escenarios desconocidos: {', '.join(invalidos)}")
+    try:
+        niveles = [int(c) for c in parse_lista(args.concurrency)]
+    except ValueError:
+        parser.error("--concurrency debe ser una lista de enteros")
+
+    rng = random.Random(args.seed)
+    servidor_fake = iniciar_en_hilo(config=FallasConfig(**ESCENARIOS['normal']))
+    fake_url = f'http://127.0.0.1:{servidor_fake.server_port}/v1/forecast'
+
+    port = puerto_libre()
+    base_url = f'http://127.0.0.1:{port}'
+    log = open(args.app_log, 'w') if args.app_log else subprocess.DEVNULL
+    proceso = iniciar_gunicorn(port, fake_url, args, log)
+
+    resultados = []
+    try:
+        esperar_health(base_url, proceso)
+        print(f"App en {base_url} (workers={args.workers}, threads={args.threads}), "
+              f"Open-Meteo falso en {fake_url}, TTL clima={args.clima_ttl}s")
+
+        # Precalentar para que exista un CACHE_CLIMA al cual hacer fallback
+        ejecutar_peticion(base_url, '/api/clima', '/api/clima', args.client_timeout)
+
+        for escenario in escenarios:
+            for concurrencia in niveles:
+                resultados.append(correr_escenario(base_url, servidor_fake, escenario, concurrencia, args, rng))
+    finally:
+        proceso.terminate()
+        try:
+            proceso.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proceso.kill()
+        servidor_fake.shutdown()
+        servidor_fake.server_close()
+        if log is not subprocess.DEVNULL:
+            log.close()
+
+    advertencias = [r['advertencia'] for r in resultados if r['advertencia']]
+    if advertencias:
+        print("\nEscenarios sin llamadas al upstream (resultados no válidos):", file=sys.stderr)
+        for advertencia in advertencias:
+            print(f"  - {advertencia}", file=sys.stderr)
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados guardados en {args.json_path}")
+
+    return 1 if advertencias else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,6 +3,7 @@
 // ============================================
 document.addEventListener('DOMContentLoaded', function() {
     initTheme();
+    initIndiceGuardias();
     highlightToday();
     // aplicarDegradadoGuardiaActual(); // ELIMINADO: ya no mostramos días restantes
     initLeyendaFilter();
@@ -12,6 +13,89 @@ document.addEventListener('DOMContentLoaded', function() {
     // El usuario debe hacer click en el botón
 });
 
+// ============================================
+// ÍNDICE DE GUARDIAS EMBEBIDO POR EL SERVIDOR
+// ============================================
+// Los días se expresan como días desde 1970-01-01 (UTC), igual que en
+// generar_indice_guardias() de app.py. Cada segmento es [inicio, fin, índice].
+const MS_POR_DIA = 1000 * 60 * 60 * 24;
+
+let indiceGuardias = null;
+let segmentosPorGuardia = {};   // nombre -> segmentos ordenados por fecha
+let celdasPorDia = [];          // día del año mostrado -> celda
+let celdasFiltradas = [];
+
+function initIndiceGuardias() {
+    const script = document.getElementById('indice-guardias');
+    if (!script) {
+        return;
+    }
+
+    try {
+        indiceGuardias = JSON.parse(script.textContent);
+    } catch (error) {
+        console.error('Índice de guardias inválido:', error);
+        indiceGuardias = null;
+        return;
+    }
+
+    segmentosPorGuardia = {};
+    indiceGuardias.guardias.forEach(nombre => {
+        segmentosPorGuardia[nombre] = [];
+    });
+    indiceGuardias.segmentos.forEach(segmento => {
+        segmentosPorGuardia[indiceGuardias.guardias[segmento[2]]].push(segmento);
+    });
+
+    // Un único recorrido del DOM: después todas las búsquedas son por índice
+    const totalDias = indiceGuardias.anio_fin - indiceGuardias.anio_inicio + 1;
+    celdasPorDia = new Array(totalDias).fill(null);
+    const celdas = document.getElementsByClassName('dia-celda');
+    for (let i = 0; i < celdas.length; i++) {
+        const fecha = celdas[i].getAttribute('data-fecha');
+        const offset = fecha ? diaDesdeIso(fecha) - indiceGuardias.anio_inicio : -1;
+        if (offset >= 0 && offset < totalDias) {
+            celdasPorDia[offset] = celdas[i];
+        }
+    }
+}
+
+function diaDesdeIso(fechaStr) {
+    const [anio, mes, dia] = fechaStr.split('-').map(Number);
+    return Math.floor(Date.UTC(anio, mes - 1, dia) / MS_POR_DIA);
+}
+
+function diaDesdeFecha(fecha) {
+    return Math.floor(Date.UTC(fecha.getFullYear(), fecha.getMonth(), fecha.getDate()) / MS_POR_DIA);
+}
+
+function fechaDesdeDia(dia) {
+    const utc = new Date(dia * MS_POR_DIA);
+    return new Date(utc.getUTCFullYear(), utc.getUTCMonth(), utc.getUTCDate());
+}
+
+function obtenerCelda(fechaStr) {
+    if (!indiceGuardias) {
+        return null;
+    }
+    return celdasPorDia[diaDesdeIso(fechaStr) - indiceGuardias.anio_inicio] || null;
+}
+
+// Búsqueda binaria: primer segmento cuyo fin es >= dia
+function buscarSegmentoDesde(segmentos, dia) {
+    let bajo = 0;
+    let alto = segmentos.length;
+    while (bajo < alto) {
+        const medio = (bajo + alto) >> 1;
+        if (segmentos[medio][1] < dia) {
+            bajo = medio + 1;
+        } else {
+            alto = medio;
+        }
+    }
+    return segmentos[bajo] || null;
+}
+
 // ============================================
 // CONTROLES Y DATOS DE PAGINA
 // ============================================
@@ -159,6 +243,60 @@ function getClimaUrl(btn) {
     return path.includes('/guardias') ? '/guardias/api/clima' : '/api/clima';
 }
 
+// Pronóstico guardado en localStorage hasta que expire el caché del servidor
+const CLIMA_STORAGE_KEY = 'guardias_clima';
+
+function leerPronosticoGuardado() {
+    try {
+        const raw = localStorage.getItem(CLIMA_STORAGE_KEY);
+        if (!raw) {
+            return null;
+        }
+
+        const guardado = JSON.parse(raw);
+        const expira = guardado ? Number(guardado.expira) * 1000 : NaN;
+        if (!guardado || !guardado.clima || !Number.isFinite(expira) || expira <= Date.now()) {
+            localStorage.removeItem(CLIMA_STORAGE_KEY);
+            return null;
+        }
+        return guardado.clima;
+    } catch (error) {
+        return null;
+    }
+}
+
+function guardarPronostico(data) {
+    if (!data || !Number.isFinite(Number(data.expira))) {
+        return;
+    }
+
+    try {
+        localStorage.setItem(CLIMA_STORAGE_KEY, JSON.stringify({
+            expira: data.expira,
+            clima: data.clima
+        }));
+    } catch (error) {
+        // Sin espacio o almacenamiento deshabilitado: se usa solo la red
+    }
+}
+
+function obtenerPronostico(climaUrl) {
+    const guardado = leerPronosticoGuardado();
+    if (guardado) {
+        return Promise.resolve({ success: true, clima: guardado });
+    }
+
+    return fetch(climaUrl)
+        .then(response => response.json())
+        .then(data => {
+            const tieneDatos = data && data.clima && Object.keys(data.clima).length > 0;
+            if (data.success && tieneDatos) {
+                guardarPronostico(data);
+            }
+            return data;
+        });
+}
+
 function cargarPronosticoAsincrono() {
     const btn = document.getElementById('btn-clima');
     if (!btn) return;
@@ -170,8 +308,7 @@ function cargarPronosticoAsincrono() {
     btn.disabled = true;
     btn.title = 'Cargando pronóstico...';
 
-    fetch(climaUrl)
-        .then(response => response.json())
+    obtenerPronostico(climaUrl)
         .then(data => {
             console.log('Respuesta del API:', data);
             const tieneDatos = data && data.clima && Object.keys(data.clima).length > 0;
@@ -243,8 +380,7 @@ function solicitarPronostico() {
     btn.title = 'Cargando...';
     btn.style.opacity = '1';
 
-    fetch(climaUrl)
-        .then(response => response.json())
+    obtenerPronostico(climaUrl)
         .then(data => {
             console.log('Respuesta manual del API:', data);
             const tieneDatos = data && data.clima && Object.keys(data.clima).length > 0;
@@ -282,25 +418,13 @@ function solicitarPronostico() {
 // APLICAR PRONÓSTICO A LAS CELDAS
 // ============================================
 function aplicarPronostico(climaData) {
-    console.log('Aplicando pronóstico a las celdas:', Object.keys(climaData).length, 'fechas');
-    console.log('Datos completos:', climaData);
-    console.log('Primera fecha en datos:', Object.keys(climaData)[0]);
-
-    // Obtener fecha de hoy en formato YYYY-MM-DD (zona horaria local)
-    const hoy = new Date();
-    const año = hoy.getFullYear();
-    const mes = String(hoy.getMonth() + 1).padStart(2, '0');
-    const dia = String(hoy.getDate()).padStart(2, '0');
-    const hoyStr = `${año}-${mes}-${dia}`;
-    console.log('Fecha de hoy (local):', hoyStr);
-
-    let celdasActualizadas = 0;
-    let celdasEncontradas = 0;
-
     Object.keys(climaData).forEach(fecha => {
+        const celda = obtenerCelda(fecha);
+        if (!celda) {
+            return;
+        }
+
         const climaInfo = climaData[fecha];
-        const celdas = document.querySelectorAll(`.dia-celda[data-fecha="${fecha}"]`);
-        celdasEncontradas += celdas.length;
 
         // El API puede retornar string (solo emoji) o objeto {emoji, temp_max, temp_min}
         let emoji;
@@ -309,71 +433,52 @@ function aplicarPronostico(climaData) {
 
         if (typeof climaInfo === 'string') {
             emoji = climaInfo;
-            console.log(`Fecha ${fecha}: formato STRING, no hay temperaturas`);
-        } else if (typeof climaInfo === 'object') {
+        } else if (climaInfo && typeof climaInfo === 'object') {
             emoji = climaInfo.emoji;
             tempMax = climaInfo.temp_max;
             tempMin = climaInfo.temp_min;
-            console.log(`Fecha ${fecha}: formato OBJETO, temp_max=${tempMax}, temp_min=${tempMin}`);
         } else {
             console.error(`Formato inesperado para fecha ${fecha}:`, climaInfo);
             return;
         }
 
-        console.log(`Fecha ${fecha}: encontradas ${celdas.length} celdas, emoji: ${emoji}`);
-
-        celdas.forEach(celda => {
-            const fechaCelda = celda.getAttribute('data-fecha');
-            const esGuardiaRestante = celda.classList.contains('guardia-actual-highlight');
-            const esHoy = celda.classList.contains('today');
-
-            console.log(`  - Celda fecha="${fechaCelda}": guardia-restante=${esGuardiaRestante}, hoy=${esHoy}`);
-
-            // Aplicar emoji a TODAS las celdas que tengan pronóstico (no solo guardia actual o hoy)
-            // Esto permite ver el pronóstico completo cuando se solicita
-            let emojiSpan = celda.querySelector('.clima-emoji');
-            if (!emojiSpan) {
-                emojiSpan = document.createElement('span');
-                emojiSpan.className = 'clima-emoji';
-                celda.appendChild(emojiSpan);
-            }
-            emojiSpan.textContent = emoji;
-
-            const maxVal = (tempMax !== null && tempMax !== undefined && tempMax !== '') ? Number(tempMax) : null;
-            const minVal = (tempMin !== null && tempMin !== undefined && tempMin !== '') ? Number(tempMin) : null;
-            let tempAvg = null;
-
-            if (Number.isFinite(maxVal) && Number.isFinite(minVal)) {
-                tempAvg = Math.round((maxVal + minVal) / 2);
-            } else if (Number.isFinite(maxVal)) {
-                tempAvg = Math.round(maxVal);
-            } else if (Number.isFinite(minVal)) {
-                tempAvg = Math.round(minVal);
-            }
-
-            const tempSpan = celda.querySelector('.clima-temp');
-            if (tempSpan) {
-                tempSpan.remove();
-            }
+        let emojiSpan = celda.querySelector('.clima-emoji');
+        if (!emojiSpan) {
+            emojiSpan = document.createElement('span');
+            emojiSpan.className = 'clima-emoji';
+            celda.appendChild(emojiSpan);
+        }
+        emojiSpan.textContent = emoji;
+
+        const maxVal = (tempMax !== null && tempMax !== undefined && tempMax !== '') ? Number(tempMax) : null;
+        const minVal = (tempMin !== null && tempMin !== undefined && tempMin !== '') ? Number(tempMin) : null;
+        let tempAvg = null;
+
+        if (Number.isFinite(maxVal) && Number.isFinite(minVal)) {
+            tempAvg = Math.round((maxVal + minVal) / 2);
+        } else if (Number.isFinite(maxVal)) {
+            tempAvg = Math.round(maxVal);
+        } else if (Number.isFinite(minVal)) {
+            tempAvg = Math.round(minVal);
+        }
 
-            celdasActualizadas++;
+        const tempSpan = celda.querySelector('.clima-temp');
+        if (tempSpan) {
+            tempSpan.remove();
+        }
 
-            // Guardar datos de temperatura en el elemento
-            celda.setAttribute('data-temp-max', tempMax ?? '');
-            celda.setAttribute('data-temp-min', tempMin ?? '');
-            celda.setAttribute('data-temp-avg', tempAvg ?? '');
+        // Guardar datos de temperatura en el elemento
+        celda.setAttribute('data-temp-max', tempMax ?? '');
+        celda.setAttribute('data-temp-min', tempMin ?? '');
+        celda.setAttribute('data-temp-avg', tempAvg ?? '');
 
-            // Guardar info para tooltip personalizado
-            celda.setAttribute('data-clima-emoji', emoji);
+        // Guardar info para tooltip personalizado
+        celda.setAttribute('data-clima-emoji', emoji);
 
-            // Agregar eventos para tooltip personalizado
-            celda.addEventListener('mouseenter', mostrarTooltipClima);
-            celda.addEventListener('mouseleave', ocultarTooltipClima);
-        });
+        // Agregar eventos para tooltip personalizado
+        celda.addEventListener('mouseenter', mostrarTooltipClima);
+        celda.addEventListener('mouseleave', ocultarTooltipClima);
     });
-
-    console.log(`Total de celdas encontradas: ${celdasEncontradas}`);
-    console.log(`Total de celdas actualizadas con pronóstico: ${celdasActualizadas}`);
 }
 
 // ============================================
@@ -521,35 +626,48 @@ function initLeyendaFilter() {
 
 function activarFiltro(guardiaName) {
     const leyendaItems = document.querySelectorAll('.leyenda-item');
-    const todasLasCeldas = document.querySelectorAll('.dia-celda');
 
     leyendaItems.forEach(item => {
         if (item.getAttribute('data-guardia') === guardiaName) {
             item.style.opacity = '1';
             item.style.transform = 'scale(1.05)';
             item.style.boxShadow = '0 4px 12px rgba(0, 0, 0, 0.3)';
+            item.style.filter = 'none';
         } else {
             item.style.opacity = '0.4';
+            item.style.transform = 'scale(1)';
+            item.style.boxShadow = '';
             item.style.filter = 'grayscale(100%)';
         }
     });
 
-    todasLasCeldas.forEach(celda => {
-        const guardiaData = celda.getAttribute('data-guardia');
+    limpiarCeldasFiltradas();
+    if (!indiceGuardias) {
+        return;
+    }
 
-        if (guardiaData && guardiaData === guardiaName) {
-            celda.style.opacity = '1';
-            celda.style.filter = 'none';
-        } else {
-            celda.style.opacity = '0.3';
-            celda.style.filter = 'grayscale(80%)';
+    // Solo se tocan las celdas de los segmentos de esta guardia dentro del año
+    const segmentos = segmentosPorGuardia[guardiaName] || [];
+    segmentos.forEach(segmento => {
+        const desde = Math.max(segmento[0], indiceGuardias.anio_inicio);
+        const hasta = Math.min(segmento[1], indiceGuardias.anio_fin);
+        for (let dia = desde; dia <= hasta; dia++) {
+            const celda = celdasPorDia[dia - indiceGuardias.anio_inicio];
+            if (celda) {
+                celda.classList.add('filtro-activo');
+                celdasFiltradas.push(celda);
+            }
         }
     });
+
+    const calendario = document.getElementById('calendario-captura');
+    if (calendario) {
+        calendario.classList.add('filtrando');
+    }
 }
 
 function desactivarFiltro() {
     const leyendaItems = document.querySelectorAll('.leyenda-item');
-    const todasLasCeldas = document.querySelectorAll('.dia-celda');
 
     leyendaItems.forEach(item => {
         item.style.opacity = '1';
@@ -558,10 +676,19 @@ function desactivarFiltro() {
         item.style.filter = 'none';
     });
 
-    todasLasCeldas.forEach(celda => {
-        celda.style.opacity = '1';
-        celda.style.filter = 'none';
+    limpiarCeldasFiltradas();
+
+    const calendario = document.getElementById('calendario-captura');
+    if (calendario) {
+        calendario.classList.remove('filtrando');
+    }
+}
+
+function limpiarCeldasFiltradas() {
+    celdasFiltradas.forEach(celda => {
+        celda.classList.remove('filtro-activo');
     });
+    celdasFiltradas = [];
 }
 
 // ============================================
@@ -612,85 +739,24 @@ function ocultarTooltip() {
 }
 
 function calcularProximaGuardia(guardiaName, fechaActual) {
-    // Buscar todas las celdas de esta guardia
-    const celdasGuardia = [];
-    const todasLasCeldas = document.querySelectorAll('.dia-celda');
-
-    todasLasCeldas.forEach(celda => {
-        const guardiaData = celda.getAttribute('data-guardia');
-        const fechaData = celda.getAttribute('data-fecha');
-
-        if (guardiaData === guardiaName && fechaData) {
-            const fecha = new Date(fechaData);
-            celdasGuardia.push(fecha);
-        }
-    });
-
-    // Ordenar fechas
-    celdasGuardia.sort((a, b) => a - b);
-
-    // Verificar si está de guardia hoy
-    const hoyStr = fechaActual.toISOString().split('T')[0];
-
-    let guardiaActualInicio = null;
-    let guardiaActualFin = null;
-    let estaDeGuardia = false;
-
-    // Buscar el bloque de guardia actual
-    for (let i = 0; i < celdasGuardia.length; i++) {
-        const fechaStr = celdasGuardia[i].toISOString().split('T')[0];
-
-        if (fechaStr === hoyStr) {
-            estaDeGuardia = true;
-
-            // Buscar inicio del bloque
-            guardiaActualInicio = celdasGuardia[i];
-            for (let j = i - 1; j >= 0; j--) {
-                const diff = (celdasGuardia[j + 1] - celdasGuardia[j]) / (1000 * 60 * 60 * 24);
-                if (diff <= 1) {
-                    guardiaActualInicio = celdasGuardia[j];
-                } else {
-                    break;
-                }
-            }
-
-            // Buscar fin del bloque
-            guardiaActualFin = celdasGuardia[i];
-            for (let j = i + 1; j < celdasGuardia.length; j++) {
-                const diff = (celdasGuardia[j] - celdasGuardia[j - 1]) / (1000 * 60 * 60 * 24);
-                if (diff <= 1) {
-                    guardiaActualFin = celdasGuardia[j];
-                } else {
-                    break;
-                }
-            }
-
-            break;
-        }
-    }
-
-    if (estaDeGuardia) {
-        const diasRestantes = Math.ceil((guardiaActualFin - fechaActual) / (1000 * 60 * 60 * 24)) + 1;
+    const hoy = diaDesdeFecha(fechaActual);
+    const segmento = buscarSegmentoDesde(segmentosPorGuardia[guardiaName] || [], hoy);
 
+    if (segmento && segmento[0] <= hoy) {
         return {
             estaDeGuardia: true,
-            diasRestantes: diasRestantes,
-            fechaInicio: formatearFecha(guardiaActualInicio),
-            fechaFin: formatearFecha(guardiaActualFin)
+            diasRestantes: segmento[1] - hoy + 1,
+            fechaInicio: formatearFecha(fechaDesdeDia(segmento[0])),
+            fechaFin: formatearFecha(fechaDesdeDia(segmento[1]))
         };
-    } else {
-        // Encontrar la próxima fecha
-        const proximaFecha = celdasGuardia.find(fecha => fecha > fechaActual);
-
-        if (proximaFecha) {
-            const diasHasta = Math.ceil((proximaFecha - fechaActual) / (1000 * 60 * 60 * 24));
+    }
 
-            return {
-                estaDeGuardia: false,
-                diasHastaProxima: diasHasta,
-                fechaProxima: formatearFecha(proximaFecha)
-            };
-        }
+    if (segmento) {
+        return {
+            estaDeGuardia: false,
+            diasHastaProxima: segmento[0] - hoy,
+            fechaProxima: formatearFecha(fechaDesdeDia(segmento[0]))
+        };
     }
 
     return {